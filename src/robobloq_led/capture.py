@@ -0,0 +1,57 @@
+import numpy as np
+import mss
+
+
+def edge_rects(mon: dict, thickness: int) -> tuple[dict, dict, dict]:
+    """
+    Left/top/right strip rectangles inside a monitor rect.
+    Thickness is clamped to a quarter of the monitor size.
+    """
+    w, h = mon["width"], mon["height"]
+    t = max(1, min(thickness, w // 4, h // 4))
+    left = {"left": mon["left"], "top": mon["top"], "width": t, "height": h}
+    top = {"left": mon["left"], "top": mon["top"], "width": w, "height": t}
+    right = {"left": mon["left"] + w - t, "top": mon["top"], "width": t, "height": h}
+    return left, top, right
+
+
+class Capture:
+    """
+    Persistent screen grabber for one monitor.
+
+    Backed by mss, which on Linux already uses XShmGetImage with a persistent
+    shared-memory segment (falls back to XGetImage when MIT-SHM is missing).
+    Not thread-safe: mss before 10.2 keeps its X display handles in a
+    threading.local, so create, grab and close a Capture on one thread.
+    """
+
+    def __init__(self, monitor_index: int):
+        self._sct = mss.mss()
+        if monitor_index < 1 or monitor_index >= len(self._sct.monitors):
+            count = len(self._sct.monitors)
+            self._sct.close()
+            raise ValueError(f"Invalid monitor index {monitor_index}. Available: 1..{count-1}")
+        self.monitor = self._sct.monitors[monitor_index]
+        self._edges: tuple[int, tuple[dict, dict, dict]] | None = None
+
+    def grab_edges(self, thickness: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Grabs only the left/top/right edge strips (three small region grabs)
+        instead of the whole monitor. Returns three BGRA views.
+        """
+        if self._edges is None or self._edges[0] != thickness:
+            self._edges = (thickness, edge_rects(self.monitor, thickness))
+        return tuple(self._grab_region(rect) for rect in self._edges[1])
+
+    def _grab_region(self, rect: dict) -> np.ndarray:
+        shot = self._sct.grab(rect)
+        return np.frombuffer(shot.raw, dtype=np.uint8).reshape(shot.height, shot.width, 4)
+
+    def close(self) -> None:
+        self._sct.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
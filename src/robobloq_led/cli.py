@@ -1,18 +1,62 @@
-import argparse
+import sys
 from .device import RobobloqController, find_vendor_device
 
-def main():
-    p = argparse.ArgumentParser(prog="robobloq-led")
-    p.add_argument("--dev", default=None, help="Path to hidraw device (auto-detect if omitted)")
-    p.add_argument("--r", type=int, required=True)
-    p.add_argument("--g", type=int, required=True)
-    p.add_argument("--b", type=int, required=True)
-    args = p.parse_args()
-
-    dev = args.dev or find_vendor_device()
-    ctl = RobobloqController(dev=dev)
-    ctl.set_color(args.r, args.g, args.b)
-    print(f"OK: set ({args.r},{args.g},{args.b}) on {dev}")
+USAGE = "usage: robobloq-led [-h] [--dev DEV] --r R --g G --b B\n"
+HELP = USAGE + """
+options:
+  -h, --help  show this help message and exit
+  --dev DEV   Path to hidraw device (auto-detect if omitted)
+  --r R
+  --g G
+  --b B
+"""
+
+def _error(msg: str):
+    sys.stderr.write(f"{USAGE}robobloq-led: error: {msg}\n")
+    raise SystemExit(2)
+
+def parse_args(argv: list[str]) -> dict:
+    # Hand-rolled instead of argparse: this is usually bound to a hotkey, and four
+    # flags don't justify argparse's import + parser construction on every run.
+    opts = {"dev": None, "r": None, "g": None, "b": None}
+    i = 0
+    while i < len(argv):
+        arg = argv[i]
+        if arg in ("-h", "--help"):
+            sys.stdout.write(HELP)
+            raise SystemExit(0)
+
+        name, sep, value = arg.partition("=")
+        key = name[2:] if name.startswith("--") else None
+        if key not in opts:
+            _error(f"unrecognized arguments: {arg}")
+        if not sep:
+            i += 1
+            if i >= len(argv):
+                _error(f"argument {name}: expected one argument")
+            value = argv[i]
+
+        if key == "dev":
+            opts[key] = value
+        else:
+            try:
+                opts[key] = int(value)
+            except ValueError:
+                _error(f"argument {name}: invalid int value: '{value}'")
+        i += 1
+
+    missing = [f"--{k}" for k in ("r", "g", "b") if opts[k] is None]
+    if missing:
+        _error("the following arguments are required: " + ", ".join(missing))
+    return opts
+
+def main(argv: list[str] | None = None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+
+    dev = args["dev"] or find_vendor_device()
+    with RobobloqController(dev=dev) as ctl:
+        ctl.set_color(args["r"], args["g"], args["b"])
+    print(f"OK: set ({args['r']},{args['g']},{args['b']}) on {dev}")
 
 if __name__ == "__main__":
     main()
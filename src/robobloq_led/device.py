@@ -1,7 +1,13 @@
+# Performance contract: this module must only import the standard library.
+# The robobloq-led CLI imports it for one-shot color changes, so pulling in
+# numpy/mss/fastapi here would put their import cost on every invocation.
 import os
 import glob
 import fcntl
-from dataclasses import dataclass
+import struct
+import pathlib
+import threading
+from dataclasses import dataclass, field
 
 # Your working BLUE capture (base packet). We modify counter+RGB+checksum.
 BASE_HEX = (
@@ -11,6 +17,19 @@ BASE_HEX = (
     "00000000000000000000000000000000"
 )
 
+_BASE_PKT = bytes.fromhex(BASE_HEX)
+if len(_BASE_PKT) != 64:
+    raise ValueError("BASE_HEX must be 64 bytes")
+
+# Checksum covers bytes 0..14; only counter (3) and RGB (6..8) change per report
+_BASE_PREFIX_SUM = (
+    sum(_BASE_PKT[0:15]) - _BASE_PKT[3] - _BASE_PKT[6] - _BASE_PKT[7] - _BASE_PKT[8]
+) & 0xFFFF
+
+# Bytes 3..8 = counter, two constant template bytes, R, G, B: written with one C call
+_PACK_BODY = struct.Struct("6B").pack_into
+_BASE_B4, _BASE_B5 = _BASE_PKT[4], _BASE_PKT[5]
+
 IOC_WRITE = 1
 def _IOC(dir_, type_, nr, size):
     return (dir_ << 30) | (ord(type_) << 8) | (nr << 0) | (size << 16)
@@ -29,10 +48,58 @@ def _is_vendor_descriptor(hidraw_path: str) -> bool:
     except FileNotFoundError:
         return False
 
+def _usb_key(hidraw_path: str) -> str | None:
+    # "busnum:devnum" of the USB device behind a hidraw node; changes on every replug
+    sysname = os.path.basename(hidraw_path)
+    path = os.path.realpath(f"/sys/class/hidraw/{sysname}/device")
+    while path != "/":
+        try:
+            with open(os.path.join(path, "busnum")) as fbus, open(os.path.join(path, "devnum")) as fdev:
+                return f"{fbus.read().strip()}:{fdev.read().strip()}"
+        except FileNotFoundError:
+            path = os.path.dirname(path)
+    return None
+
+def _cache_path() -> pathlib.Path:
+    return pathlib.Path(os.environ.get("XDG_RUNTIME_DIR", "/tmp")) / "robobloq-led.cache"
+
+def _read_cached_device() -> str | None:
+    # Cache line: "<hidraw path>\t<busnum:devnum>"; trusted only while the node still
+    # exists, belongs to the same USB device (i.e. no replug since it was written)
+    # and is still the vendor interface (all interfaces share busnum:devnum, and a
+    # driver rebind can renumber them)
+    path = _cache_path()
+    try:
+        if path.stat().st_uid != os.getuid():
+            return None  # not ours, e.g. planted in a shared /tmp
+        dev, key = path.read_text().strip().split("\t")
+    except (OSError, ValueError):
+        return None
+    if os.path.dirname(dev) != "/dev" or not os.path.basename(dev).startswith("hidraw"):
+        return None
+    if not os.path.exists(dev) or _usb_key(dev) != key:
+        return None
+    if not _is_vendor_descriptor(dev):  # one 3-byte sysfs read
+        return None
+    return dev
+
+def _write_cached_device(dev: str) -> None:
+    key = _usb_key(dev)
+    if key is None:
+        return
+    try:
+        _cache_path().write_text(f"{dev}\t{key}\n")
+    except OSError:
+        pass
+
 def find_vendor_device() -> str:
     """Find the correct /dev/hidrawX node for the ROBOBLOQ vendor interface."""
-    for dev in sorted(glob.glob("/dev/hidraw*")):
+    cached = _read_cached_device()
+    if cached is not None:
+        return cached
+    for dev in glob.iglob("/dev/hidraw*"):
         if _is_vendor_descriptor(dev):
+            _write_cached_device(dev)
             return dev
     raise RuntimeError("Vendor HID interface not found. Unplug/replug the LED and try again.")
 
@@ -40,45 +107,89 @@ def find_vendor_device() -> str:
 class RobobloqController:
     dev: str
     counter: int = 0x0E  # start from known working value
+    _fd: int = field(default=-1, init=False, repr=False)
+    _feature_fd: int = field(default=-1, init=False, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
+    _pkt: bytearray = field(default_factory=lambda: bytearray(_BASE_PKT), init=False, repr=False)
+
+    def __post_init__(self):
+        # One fd for the controller's lifetime instead of open/close per color
+        self._fd = os.open(self.dev, os.O_WRONLY)
 
-    def _build_report(self, r: int, g: int, b: int) -> bytes:
-        pkt = bytearray(bytes.fromhex(BASE_HEX))
-        if len(pkt) != 64:
-            raise ValueError("BASE_HEX must be 64 bytes")
+    def _build_report(self, r: int, g: int, b: int) -> bytearray:
+        """
+        Fills the controller's persistent 64-byte report buffer and returns it.
+        The buffer is reused by the next call, so callers must not keep it.
+        """
+        pkt = self._pkt
 
-        pkt[3] = self.counter & 0xFF
-        pkt[6] = int(r) & 0xFF
-        pkt[7] = int(g) & 0xFF
-        pkt[8] = int(b) & 0xFF
+        counter = self.counter & 0xFF
+        r = int(r) & 0xFF
+        g = int(g) & 0xFF
+        b = int(b) & 0xFF
+        _PACK_BODY(pkt, 3, counter, _BASE_B4, _BASE_B5, r, g, b)
 
         # checksum byte = sum(bytes[0..14]) & 0xFF
-        pkt[15] = sum(pkt[0:15]) & 0xFF
+        pkt[15] = (_BASE_PREFIX_SUM + counter + r + g + b) & 0xFF
 
-        return bytes(pkt)
+        return pkt
 
     def _send_feature(self, report64: bytes) -> None:
+        if self._feature_fd < 0:
+            self._feature_fd = os.open(self.dev, os.O_RDWR)
         buf = bytearray(report64)
-        fd = os.open(self.dev, os.O_RDWR)
         try:
-            fcntl.ioctl(fd, HIDIOCSFEATURE(64), buf, True)
-        finally:
-            os.close(fd)
+            fcntl.ioctl(self._feature_fd, HIDIOCSFEATURE(64), buf, True)
+        except OSError:
+            # Likely stale after a replug: reopen on the next fallback
+            os.close(self._feature_fd)
+            self._feature_fd = -1
+            raise
 
     def _send_raw(self, report64: bytes) -> None:
-        with open(self.dev, "wb", buffering=0) as f:
-            f.write(report64)
+        os.write(self._fd, report64)
+
+    def _reopen(self) -> None:
+        # The kept-open fd dies with the device (ENODEV after a replug); the node
+        # usually comes back under the same path, so open it again
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+        self._fd = os.open(self.dev, os.O_WRONLY)
 
     def set_color(self, r: int, g: int, b: int) -> None:
-        report = self._build_report(r, g, b)
-        # raw write works on your machine; feature is a safe fallback
-        try:
-            self._send_raw(report)
-        except OSError:
-            self._send_feature(report)
-        self.counter = (self.counter + 1) & 0xFF
+        # Serialize writers (e.g. the web app's fade thread vs request handlers)
+        with self._lock:
+            report = self._build_report(r, g, b)
+            # raw write works on your machine; feature is a safe fallback
+            try:
+                self._send_raw(report)
+            except OSError:
+                try:
+                    self._reopen()
+                    self._send_raw(report)
+                except OSError:
+                    self._send_feature(report)
+            self.counter = (self.counter + 1) & 0xFF
+
+    def close(self) -> None:
+        for fd in (self._fd, self._feature_fd):
+            if fd >= 0:
+                os.close(fd)
+        self._fd = self._feature_fd = -1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __del__(self):
+        self.close()
 
 def set_color(r: int, g: int, b: int, dev: str | None = None) -> None:
     """Convenience function: set a solid color."""
     if dev is None:
         dev = find_vendor_device()
-    RobobloqController(dev=dev).set_color(r, g, b)
+    with RobobloqController(dev=dev) as ctl:
+        ctl.set_color(r, g, b)
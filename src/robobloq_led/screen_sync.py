@@ -1,86 +1,304 @@
 import time
+import queue
 import argparse
+import functools
+import threading
 import numpy as np
-import mss
 
 from .device import RobobloqController, find_vendor_device
 
-def avg_edge_color(img: np.ndarray, thickness: int = 80):
+HID_POLL_NS = 1_000_000  # device is a 1 kHz-polled HID interrupt endpoint
+PROBE_PIXELS = 256  # pixels hashed per frame by frame_probe
+PROBE_MAX_SKIP = 8  # frames the probe may skip in a row before a full reduction
+
+try:
+    from numba import njit, prange
+except ImportError:  # optional: pip install "robobloq-led[fast]"
+    njit = None
+
+try:
+    import cv2
+except ImportError:  # optional: pip install "robobloq-led[fast]"
+    cv2 = None
+
+# float32 sums of uint8 stay exact integers up to this many pixels (255 * 2**16 < 2**24)
+F32_EXACT_PIXELS = 1 << 16
+
+@functools.lru_cache(maxsize=16)
+def _ones(n: int) -> np.ndarray:
+    ones = np.ones(n, dtype=np.float32)
+    ones.flags.writeable = False
+    return ones
+
+def _strip_sum(strip: np.ndarray) -> np.ndarray:
+    # BLAS gemv (ones @ pixels) on float32 row chunks small enough that the sums
+    # stay exact; only the per-chunk 4-vectors are accumulated in float64. ~9x
+    # faster than a uint32 .sum(axis=(0, 1)), which NumPy doesn't vectorize for uint8.
+    rows = max(1, F32_EXACT_PIXELS // strip.shape[1])
+    total = np.zeros(4)
+    for y in range(0, strip.shape[0], rows):
+        px = strip[y : y + rows].astype(np.float32).reshape(-1, 4)  # contiguous, also for strided views
+        total += _ones(px.shape[0]) @ px
+    return total
+
+def _cv2_strip_mean(strip: np.ndarray) -> tuple[int, int, int]:
+    # cv2.mean is a SIMD reduction, ~8x faster than _strip_sum on full strips. It
+    # returns sum * (1/n) in double, so a flat 200 may come back as 199.999...;
+    # recover the exact integer sum so the floor matches the integer path.
+    n = strip.shape[0] * strip.shape[1]
+    b, g, r = cv2.mean(strip)[:3]
+    return round(b * n) // n, round(g * n) // n, round(r * n) // n
+
+def avg_edge_color(left: np.ndarray, top: np.ndarray, right: np.ndarray):
+    """
+    left/top/right: edge strips, HxWx4 BGRA uint8 (as captured by mss)
+    Returns avg BGR colors for left/top/right edges; data stays BGRA end-to-end,
+    callers swap to RGB on the final combined triple.
     """
-    img: HxWx3 RGB uint8
-    Returns avg colors for left/top/right edges.
+    if cv2 is not None:
+        return _cv2_strip_mean(left), _cv2_strip_mean(top), _cv2_strip_mean(right)
+    sums = np.stack((_strip_sum(left), _strip_sum(top), _strip_sum(right)))
+    counts = np.array([s.shape[0] * s.shape[1] for s in (left, top, right)], dtype=np.float64)
+    # Exact integer sums, so this floor matches integer // division
+    l, tcol, r = (sums[:, :3] // counts[:, None]).astype(np.int64).tolist()
+    return tuple(l), tuple(tcol), tuple(r)
+
+def combine_edges(left, top, right):
+    """
+    Combine edges into one solid color (device currently runs whole-strip color).
+    Weighted towards top for movies. Works per channel, in whatever order it's given.
+    """
+    # 0.25*l + 0.50*t + 0.25*r in integer math
+    return tuple((int(l) + 2 * int(t) + int(r)) >> 2 for l, t, r in zip(left, top, right))
+
+def frame_probe(strips, phase: int) -> int:
+    """
+    Hash of ~PROBE_PIXELS BGRA pixels sampled evenly across the edge strips.
+    Used to skip the reduction on static frames. `phase` shifts the sample
+    grid between frames, but each probe only compares two consecutive frames:
+    a change that lands between one frame's samples is never seen again while
+    the screen stays static, so callers must still reduce every few frames.
     """
-    h, w, _ = img.shape
-    t = max(1, min(thickness, w // 4, h // 4))
+    per_strip = PROBE_PIXELS // len(strips)
+    samples = []
+    for strip in strips:
+        words = strip.view(np.uint32).ravel()  # one word per BGRA pixel
+        stride = max(1, words.size // per_strip)
+        samples.append(words[phase % stride :: stride][:per_strip].tobytes())
+    return hash(b"".join(samples))
 
-    left = img[:, :t, :]
-    top = img[:t, :, :]
-    right = img[:, w - t :, :]
+if njit is not None:
+    # The plain per-byte loop is deliberate: LLVM auto-vectorizes it into widening
+    # uint8 adds, and a packed-word (SWAR) variant measured slower on real strips.
+    def _strip_mean_bgr_impl(strip):
+        h, w = strip.shape[0], strip.shape[1]
+        sb = sg = sr = 0
+        for y in prange(h):
+            for x in range(w):
+                sb += strip[y, x, 0]
+                sg += strip[y, x, 1]
+                sr += strip[y, x, 2]
+        n = h * w
+        return sb // n, sg // n, sr // n
 
-    l = left.mean(axis=(0, 1))
-    tcol = top.mean(axis=(0, 1))
-    r = right.mean(axis=(0, 1))
+    _strip_mean_bgr = njit(parallel=True, cache=True, fastmath=True)(_strip_mean_bgr_impl)
+    # Serial build (prange acts as range) for callers off the main thread: numba's
+    # default workqueue threading layer hangs interpreter exit once a parallel
+    # kernel has run on another thread, which is where the web app's loop runs.
+    # Not cached itself: both builds would share one cache file keyed by the same
+    # function (the cached _edge_rgb_smooth carries its code anyway).
+    _strip_mean_bgr_serial = njit(fastmath=True)(_strip_mean_bgr_impl)
 
-    return tuple(l.astype(int)), tuple(tcol.astype(int)), tuple(r.astype(int))
+    @njit(cache=True, fastmath=True)
+    def _edge_rgb(left, top, right):
+        """
+        Fused avg_edge_color + combine_edges on the BGRA edge strips.
+        Returns the combined (R, G, B) without NumPy temporaries.
+        """
+        lb, lg, lr = _strip_mean_bgr(left)
+        tb, tg, tr = _strip_mean_bgr(top)
+        rb, rg, rr = _strip_mean_bgr(right)
+        R = (lr + 2 * tr + rr) >> 2
+        G = (lg + 2 * tg + rg) >> 2
+        B = (lb + 2 * tb + rb) >> 2
+        return R, G, B
+
+    @njit(cache=True, fastmath=True)
+    def _edge_rgb_smooth(left, top, right, smooth, alpha):
+        """
+        Serial _edge_rgb plus the EMA step in one call, safe on any thread:
+        updates `smooth` (float32 RGB) in place, returns it clipped to 0..255 ints.
+        """
+        lb, lg, lr = _strip_mean_bgr_serial(left)
+        tb, tg, tr = _strip_mean_bgr_serial(top)
+        rb, rg, rr = _strip_mean_bgr_serial(right)
+        smooth[0] += alpha * (((lr + 2 * tr + rr) >> 2) - smooth[0])
+        smooth[1] += alpha * (((lg + 2 * tg + rg) >> 2) - smooth[1])
+        smooth[2] += alpha * (((lb + 2 * tb + rb) >> 2) - smooth[2])
+        return (
+            int(min(max(smooth[0], 0.0), 255.0)),
+            int(min(max(smooth[1], 0.0), 255.0)),
+            int(min(max(smooth[2], 0.0), 255.0)),
+        )
+else:
+    _edge_rgb = _edge_rgb_smooth = None
 
-def combine_edges(left_rgb, top_rgb, right_rgb):
+def warm_kernels() -> None:
     """
-    Combine edges into one solid color (device currently runs whole-strip color).
-    Weighted towards top for movies.
+    Compiles _edge_rgb_smooth (or loads it from numba's on-disk cache) with a
+    dummy frame, so the first real frame doesn't pay for it. No-op without numba.
+    """
+    if _edge_rgb_smooth is None:
+        return
+    strip = np.zeros((4, 4, 4), dtype=np.uint8)
+    # Contiguous strips and [::down, ::down] views compile separately
+    for s in (strip, strip[::2, ::2]):
+        _edge_rgb_smooth(s, s, s, np.zeros(3, dtype=np.float32), 0.5)
+
+class ColorWriter:
+    """
+    Writes colors to the device on a background thread, so the USB write overlaps
+    the next capture. Holds at most one pending color: a newer color replaces an
+    unsent one (we want the latest color, not a queue of stale ones).
+    A failed write stops the thread; the next put() re-raises its error.
     """
-    lr = np.array(left_rgb, dtype=np.float32)
-    tr = np.array(top_rgb, dtype=np.float32)
-    rr = np.array(right_rgb, dtype=np.float32)
-    out = (0.25 * lr + 0.50 * tr + 0.25 * rr)
-    return tuple(out.astype(int))
+
+    def __init__(self, ctl: RobobloqController):
+        self._ctl = ctl
+        self._queue: queue.Queue = queue.Queue(maxsize=1)
+        self._error: Exception | None = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def put(self, rgb) -> None:
+        if self._error is not None:
+            raise self._error
+        self._offer(rgb)
+
+    def _offer(self, item) -> None:
+        while True:
+            try:
+                self._queue.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def _run(self) -> None:
+        try:
+            self._write_loop()
+        except Exception as e:
+            self._error = e
+
+    def _write_loop(self) -> None:
+        last_write_ns = 0
+        while True:
+            rgb = self._queue.get()
+            if rgb is None:
+                return
+            # Never faster than the device polls its endpoint, so writes can't queue up
+            wait_ns = HID_POLL_NS - (time.monotonic_ns() - last_write_ns)
+            if wait_ns > 0:
+                time.sleep(wait_ns / 1e9)
+                try:
+                    rgb = self._queue.get_nowait()  # something newer arrived meanwhile
+                except queue.Empty:
+                    pass
+                if rgb is None:
+                    return
+            self._ctl.set_color(*rgb)
+            last_write_ns = time.monotonic_ns()
+
+    def close(self) -> None:
+        self._offer(None)
+        self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
 
 def run_sync(monitor_index: int = 2, fps: int = 25, thickness: int = 80):
     dev = find_vendor_device()
-    ctl = RobobloqController(dev=dev)
 
-    dt = 1.0 / max(1, fps)
+    dt_ns = 1_000_000_000 // max(1, fps)
+
+    from .capture import Capture  # mss: only needed once capture starts
 
-    with mss.mss() as sct:
-        if monitor_index < 1 or monitor_index >= len(sct.monitors):
-            raise SystemExit(
-                f"Invalid monitor index {monitor_index}. Available: 1..{len(sct.monitors)-1}"
-            )
+    try:
+        cap = Capture(monitor_index)
+    except ValueError as e:
+        raise SystemExit(str(e))
 
-        mon = sct.monitors[monitor_index]
+    with cap, RobobloqController(dev=dev) as ctl, ColorWriter(ctl) as writer:
         print(
             f"Sync running @ {fps} FPS | thickness={thickness}px | monitor_index={monitor_index}"
         )
-        print("Monitor rect:", mon)
+        print("Monitor rect:", cap.monitor)
         print("Ctrl+C to stop.\n")
 
         # Smoothing + fewer writes
         smooth = np.array([0.0, 0.0, 0.0], dtype=np.float32)
         alpha = 0.35  # lower=smoother, higher=more reactive
-        last_rgb = (-1, -1, -1)
+        beta = 1.0 - alpha
+        target = np.zeros(3, dtype=np.float32)
+        tmp = np.empty(3, dtype=np.float32)
+        lr = lg = lb = -1  # last color handed to the writer
+        next_deadline = time.monotonic_ns()
+        phase = 0
+        next_probe = None
+        skipped = 0
 
         while True:
-            start = time.time()
+            # Only the three edge strips are captured; they are thin enough to
+            # reduce at native resolution (contiguous, no strided [::4, ::4] view)
+            strips = cap.grab_edges(thickness)
 
-            # Capture BGRA -> RGB, then downscale for speed
-            frame = np.array(sct.grab(mon))[:, :, :3][:, :, ::-1]  # RGB
-            img = frame[::4, ::4, :]  # sample every 4th pixel (fast)
+            # Cheap change gate: compare against the probe taken last frame at this
+            # phase, then take the next phase's probe for the following frame
+            static = frame_probe(strips, phase) == next_probe
+            phase += 1
+            next_probe = frame_probe(strips, phase)
+            # The probe can miss a change for good; bound how stale the target gets
+            if static and skipped < PROBE_MAX_SKIP:
+                skipped += 1
+            else:
+                static = False
+                skipped = 0
 
-            l, tcol, r = avg_edge_color(img, thickness=thickness)
-            R, G, B = combine_edges(l, tcol, r)
+            if not static:
+                if _edge_rgb is not None:
+                    R, G, B = _edge_rgb(*strips)
+                else:
+                    lcol, tcol, rcol = avg_edge_color(*strips)
+                    B, G, R = combine_edges(lcol, tcol, rcol)
+                target[:] = (R, G, B)
 
-            # Apply smoothing
-            target = np.array([R, G, B], dtype=np.float32)
-            smooth = (1.0 - alpha) * smooth + alpha * target
-            rgb = tuple(np.clip(smooth, 0, 255).astype(int))
+            # Apply smoothing in place (static frames keep converging on the last
+            # target). smooth stays a convex mix of 0..255 values, so it can't go
+            # negative; min() only absorbs float32 rounding just above 255.
+            np.multiply(target, alpha, out=tmp)
+            np.multiply(smooth, beta, out=smooth)
+            np.add(smooth, tmp, out=smooth)
+            r, g, b = smooth.tolist()
+            r, g, b = min(int(r), 255), min(int(g), 255), min(int(b), 255)
 
-            # Only send if it changed enough (reduces USB spam)
-            if sum(abs(a - b) for a, b in zip(rgb, last_rgb)) > 6:
-                ctl.set_color(*rgb)
-                last_rgb = rgb
+            # Only send if it changed enough (reduces USB spam); the writer
+            # thread does the actual USB write while we capture the next frame
+            if abs(r - lr) + abs(g - lg) + abs(b - lb) > 6:
+                writer.put((r, g, b))
+                lr, lg, lb = r, g, b
 
-            elapsed = time.time() - start
-            if elapsed < dt:
-                time.sleep(dt - elapsed)
+            next_deadline += dt_ns
+            now = time.monotonic_ns()
+            if now < next_deadline:
+                time.sleep((next_deadline - now) / 1e9)
+            elif now - next_deadline > dt_ns:
+                # Fell behind by more than a frame: drop the missed frames instead of catching up
+                next_deadline = now
 
 def main():
     p = argparse.ArgumentParser(description="Screen sync for Robobloq LED (solid color mode).")
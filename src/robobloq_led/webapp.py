@@ -1,30 +1,122 @@
-import mss
+import os
+import gzip
+import json
+import logging
 import time
 import asyncio
-import numpy as np
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import HTMLResponse, JSONResponse
+import hashlib
+import importlib.resources
+import functools
+import concurrent.futures
+import threading
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import HTMLResponse, Response
 from pydantic import BaseModel
 from .device import RobobloqController, find_vendor_device
 
-app = FastAPI(title="Robobloq LED Controller")
-
-# Single controller instance so counter increments properly
-_controller: RobobloqController | None = None
-_current = {"r": 255, "g": 200, "b": 120}  # assume warm-white start
-_fade_task: asyncio.Task | None = None
-_lock = asyncio.Lock()
+try:
+    import orjson
+
+    class JSONResponse(Response):
+        media_type = "application/json"
+
+        def render(self, content) -> bytes:
+            try:
+                return orjson.dumps(content)
+            except TypeError:
+                # e.g. ints beyond 64 bits, which orjson rejects; encode like Starlette
+                return json.dumps(
+                    content, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+                ).encode("utf-8")
+
+    _json_loads = orjson.loads
+except ImportError:  # optional: pip install "robobloq-led[fast]"
+    from fastapi.responses import JSONResponse
+    _json_loads = json.loads
+
+try:
+    import brotli
+except ImportError:  # optional: pip install "robobloq-led[fast]"
+    brotli = None
+
+# Constant bodies for the stop/off endpoints the UI fires repeatedly: encoded once
+_OK_BODY = JSONResponse({"ok": True}).body
+_SYNC_STOPPED_BODY = JSONResponse({"ok": True, "mode": "manual"}).body
+
+_log = logging.getLogger(__name__)
+
+FADE_MIN_STEP_MS = 5  # shortest fade step worth a wakeup + HID write
+# How long a written color is trusted to still be on the LED; the CLI, another
+# process or a replug can change it behind our back, so the same-color skip expires
+CURRENT_TRUST_S = 1.0
+
+_current = bytearray(b"\xff\xc8\x78")  # RGB, assume warm-white start
+# Monotonic time _current was last actually written by this process; None = unknown
+_current_written_at: float | None = None
+_fade_thread: threading.Thread | None = None
+_fade_stop: threading.Event | None = None  # one event per fade; its identity is the fade's token
+_state_lock = threading.Lock()  # guards device writes + _current shared with the fade thread
+_lock: asyncio.Lock | None = None  # created per lifespan: asyncio primitives bind to one loop
 _effect_task: asyncio.Task | None = None
-_effect_stop = asyncio.Event()
+_effect_stop: threading.Event | None = None  # one event per effect run
 _sync_task: asyncio.Task | None = None
-_sync_stop = asyncio.Event()
-
+_sync_stop: threading.Event | None = None    # one event per sync run
+_pending_color: tuple | None = None  # (stop, r, g, b): latest color not yet written
+_color_ready: asyncio.Event | None = None
+_color_waiters: list[asyncio.Future] = []  # /api/color requests waiting on the next write
+_color_stop = threading.Event()  # replaced on every cancel_color()
+_capture = None  # (monitor index, Capture), kept open across sync runs
+# A Capture must stay on the thread that created it (mss < 10.2 keeps its X handles
+# thread-local), so creating, grabbing and closing it all run on this one thread
+_capture_thread = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="capture")
+
+# Single controller instance so counter increments properly; cached so each
+# request pays one C-level lookup instead of a global read + None check
+@functools.cache
 def get_controller() -> RobobloqController:
-    global _controller
-    if _controller is None:
-        dev = find_vendor_device()
-        _controller = RobobloqController(dev=dev)
-    return _controller
+    return RobobloqController(dev=find_vendor_device())
+
+def get_capture(monitor_index: int):
+    """
+    Screen capture for `monitor_index`, reused across sync start/stop so a restart
+    doesn't reconnect to X and reallocate the shared-memory image (the monitor and
+    edge rects are memoized on the Capture too). Switching monitors replaces it.
+    Only call it on _capture_thread.
+    """
+    global _capture
+    if _capture is None or _capture[0] != monitor_index:
+        from .capture import Capture  # only screen sync needs mss
+        cap = Capture(monitor_index)
+        if _capture is not None:
+            _capture[1].close()
+        _capture = (monitor_index, cap)
+    return _capture[1]
+
+def _close_capture():
+    global _capture
+    if _capture is not None:
+        _capture[1].close()
+        _capture = None
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global _lock, _color_ready, _pending_color, _current_written_at
+    _lock, _color_ready, _pending_color = asyncio.Lock(), asyncio.Event(), None
+    _current_written_at = None  # the LED may have been changed while we weren't running
+    _color_waiters.clear()
+    writer = asyncio.create_task(color_writer())
+    yield
+    writer.cancel()
+    cancel_fade()
+    cancel_sync()
+    await asyncio.get_running_loop().run_in_executor(_capture_thread, _close_capture)
+    # Release the hidraw fd held by the shared controller
+    if get_controller.cache_info().currsize:
+        get_controller().close()
+        get_controller.cache_clear()
+
+app = FastAPI(title="Robobloq LED Controller", lifespan=lifespan)
 
 class Color(BaseModel):
     r: int
@@ -57,35 +149,124 @@ class SyncStartRequest(BaseModel):
     change_threshold: int = 6   # don't spam USB for tiny changes
 
 
+# brightness (0..100) -> 256-entry table, tbl[v] == v * brightness // 100.
+# Rows are built on first use, so only the levels actually requested cost anything.
+_BRIGHT_LUT: dict[int, bytes] = {}
+
 def clamp(v: int, lo: int, hi: int) -> int:
-    return lo if v < lo else hi if v > hi else v
+    return max(lo, min(hi, v))
+
+# /api/color and /api/fade parse their bodies by hand: for a few int fields this
+# is much cheaper than building a Pydantic model per request. The models above
+# still document those bodies in the OpenAPI schema.
+async def _json_body(request: Request) -> dict:
+    try:
+        data = _json_loads(await request.body())
+    except ValueError:
+        raise HTTPException(status_code=422, detail="Body must be valid JSON")
+    if not isinstance(data, dict):
+        raise HTTPException(status_code=422, detail="Body must be a JSON object")
+    return data
+
+def _int_field(data: dict, key: str, default: int | None = None) -> int:
+    v = data.get(key)
+    if v is None:
+        v = default
+        if v is None:
+            raise HTTPException(status_code=422, detail=f"Field '{key}' is required")
+    # Like Pydantic's int: 2.0 is fine, but 1.7 (and NaN/Infinity) is rejected, not truncated
+    if isinstance(v, float) and not v.is_integer():
+        raise HTTPException(status_code=422, detail=f"Field '{key}' must be an integer")
+    try:
+        return int(v)
+    except (TypeError, ValueError, OverflowError):
+        raise HTTPException(status_code=422, detail=f"Field '{key}' must be an integer")
+
+def _body_schema(model: type[BaseModel]) -> dict:
+    return {"requestBody": {
+        "required": True,
+        "content": {"application/json": {"schema": model.model_json_schema()}},
+    }}
 
 def apply_brightness(r: int, g: int, b: int, brightness: int) -> tuple[int,int,int]:
-    brightness = clamp(brightness, 0, 100)
-    scale = brightness / 100.0
-    return (int(r * scale), int(g * scale), int(b * scale))
+    # Channel clamping is fused in here, so callers pass raw request values
+    tbl = _BRIGHT_LUT.get(brightness)
+    if tbl is None:
+        # Only 0..100 are ever stored, so a hit needs no clamp
+        brightness = clamp(brightness, 0, 100)
+        tbl = _BRIGHT_LUT.get(brightness)
+        if tbl is None:
+            tbl = _BRIGHT_LUT[brightness] = bytes(v * brightness // 100 for v in range(256))
+    return (tbl[max(0, min(255, r))], tbl[max(0, min(255, g))], tbl[max(0, min(255, b))])
 
 def cancel_fade():
-    global _fade_task
-    if _fade_task and not _fade_task.done():
-        _fade_task.cancel()
-    _fade_task = None
-
+    # No join: show_color() re-checks the event under _state_lock, so the old
+    # fade thread can't write again once this returns, even if it's still winding down
+    global _fade_thread, _fade_stop
+    if _fade_stop is not None:
+        _fade_stop.set()
+    _fade_thread = None
+    _fade_stop = None
+
+# Effects and sync are stopped by setting their run's event, not Task.cancel():
+# the loop returns at its next step instead of unwinding CancelledError. Like the
+# fade and color tokens these are threading.Events, since show_color checks them
+# on worker threads. The cancel_* functions themselves run on the event loop.
 def cancel_effect():
-    global _effect_task
-    if _effect_task and not _effect_task.done():
+    global _effect_task, _effect_stop
+    if _effect_stop is not None:
         _effect_stop.set()
-        _effect_task.cancel()
     _effect_task = None
-    _effect_stop.clear()
+    _effect_stop = None
 
 def cancel_sync():
-    global _sync_task
-    if _sync_task and not _sync_task.done():
+    global _sync_task, _sync_stop
+    if _sync_stop is not None:
         _sync_stop.set()
-        _sync_task.cancel()
     _sync_task = None
-    _sync_stop.clear()
+    _sync_stop = None
+
+def cancel_color():
+    global _pending_color, _color_stop
+    _pending_color = None
+    _color_stop.set()  # an in-flight write that hasn't taken _state_lock yet is dropped
+    _color_stop = threading.Event()
+
+def show_color(stop, r: int, g: int, b: int) -> bool:
+    """
+    Write a color unless `stop` is set; returns False when the caller should exit.
+    Check and write happen under _state_lock, so once a canceller has set `stop`
+    no stale write can land after the canceller's own write. A color the LED
+    already shows is skipped (no USB transfer); comparing under the lock means
+    a write still in flight from another writer can't make that skip wrong.
+    Only a color written within CURRENT_TRUST_S is trusted: before the first
+    write _current is just a guess, and the LED can change outside this process.
+    """
+    global _current_written_at
+    with _state_lock:
+        if stop.is_set():
+            return False
+        if (
+            _current[0] == r and _current[1] == g and _current[2] == b
+            and _current_written_at is not None
+            and time.monotonic() - _current_written_at < CURRENT_TRUST_S
+        ):
+            return True
+        _current_written_at = None  # a failed write leaves the LED state unknown
+        get_controller().set_color(r, g, b)
+        _current[:] = (r, g, b)
+        _current_written_at = time.monotonic()
+        return True
+
+def post_color(stop, r: int, g: int, b: int) -> None:
+    """
+    Hand a color to color_writer; replaces any color it hasn't written yet.
+    Event-loop only. `stop` travels with the color, so cancelling its run
+    still drops it under _state_lock.
+    """
+    global _pending_color
+    _pending_color = (stop, r, g, b)
+    _color_ready.set()
 
 def wheel(pos: int) -> tuple[int, int, int]:
     # Classic rainbow wheel (0..255)
@@ -98,82 +279,137 @@ def wheel(pos: int) -> tuple[int, int, int]:
     pos -= 170
     return (0, pos * 3, 255 - pos * 3)
 
-async def effect_pulse(base: dict, speed: int):
+# Precomputed wheel: the rainbow effect only ever indexes 0..255
+WHEEL = tuple(wheel(i) for i in range(256))
+
+async def color_writer():
+    """
+    Single USB writer for /api/color, effects and sync. Producers only fill a
+    one-color slot; the write runs off the loop, so colors posted meanwhile
+    collapse into one HID write of the latest one instead of queueing up.
+    A failed write is logged and reported to the /api/color requests waiting on
+    it; the writer keeps running, so the next color retries the device.
+    """
+    global _pending_color, _color_waiters
+    while True:
+        await _color_ready.wait()
+        _color_ready.clear()
+        item, _pending_color = _pending_color, None
+        waiters, _color_waiters = _color_waiters, []
+        error = None
+        if item is not None:
+            try:
+                await asyncio.to_thread(show_color, *item)
+            except Exception as e:
+                _log.exception("LED write failed")
+                error = e
+        # Superseded or cancelled colors count as done: a newer request took over
+        for fut in waiters:
+            if not fut.done():
+                if error is None:
+                    fut.set_result(None)
+                else:
+                    fut.set_exception(error)
+
+async def _pace(deadline: float, dt: float) -> float:
+    """
+    Sleep until `deadline` on the monotonic clock and return it, so loops step
+    from fixed deadlines instead of drifting by each sleep's overshoot.
+    """
+    now = time.monotonic()
+    if now - deadline > dt:
+        # Fell behind by more than a step: drop the missed steps instead of bursting to catch up
+        deadline = now
+    await asyncio.sleep(deadline - now)  # <= 0 just yields to the loop
+    return deadline
+
+async def effect_pulse(base: dict, speed: int, stop: threading.Event):
     """
     Pulse between OFF and base color.
     speed: 1..100 (higher = faster)
     """
-    ctl = get_controller()
     speed = clamp(speed, 1, 100)
     # period in seconds (fastest ~0.4s, slowest ~3.0s)
     period = 3.0 - (speed - 1) * (2.6 / 99.0)
     steps = 50
     dt = period / steps
 
+    # One ramp per run; the loop only walks it up and back down
+    br, bg, bb = base["r"], base["g"], base["b"]
+    ramp = [
+        (round(br * t), round(bg * t), round(bb * t))
+        for t in (i / steps for i in range(steps + 1))
+    ]
+    cycle = ramp + ramp[::-1]
+
     async with _lock:
-        while not _effect_stop.is_set():
-            # up
-            for i in range(steps + 1):
-                if _effect_stop.is_set(): return
-                t = i / steps
-                r = round(base["r"] * t)
-                g = round(base["g"] * t)
-                b = round(base["b"] * t)
-                ctl.set_color(r, g, b)
-                _current["r"], _current["g"], _current["b"] = r, g, b
-                await asyncio.sleep(dt)
-            # down
-            for i in range(steps, -1, -1):
-                if _effect_stop.is_set(): return
-                t = i / steps
-                r = round(base["r"] * t)
-                g = round(base["g"] * t)
-                b = round(base["b"] * t)
-                ctl.set_color(r, g, b)
-                _current["r"], _current["g"], _current["b"] = r, g, b
-                await asyncio.sleep(dt)
-
-async def effect_rainbow(speed: int):
+        next_deadline = time.monotonic()
+        while True:
+            for r, g, b in cycle:
+                if stop.is_set(): return
+                post_color(stop, r, g, b)
+                next_deadline = await _pace(next_deadline + dt, dt)
+
+async def effect_rainbow(speed: int, stop: threading.Event):
     """
     Rainbow cycle.
     speed: 1..100 (higher = faster)
     """
-    ctl = get_controller()
     speed = clamp(speed, 1, 100)
     # delay per step (fastest ~0.01s, slowest ~0.10s)
     delay = 0.10 - (speed - 1) * (0.09 / 99.0)
 
     async with _lock:
-        j = 0
-        while not _effect_stop.is_set():
-            r, g, b = wheel(j)
-            ctl.set_color(r, g, b)
-            _current["r"], _current["g"], _current["b"] = r, g, b
-            j = (j + 1) % 256
-            await asyncio.sleep(delay)
-
-async def fade_to(target: dict, duration_ms: int, steps: int):
-    ctl = get_controller()
+        next_deadline = time.monotonic()
+        while True:
+            for r, g, b in WHEEL:
+                if stop.is_set(): return
+                post_color(stop, r, g, b)
+                next_deadline = await _pace(next_deadline + delay, delay)
+
+def _fade_worker(target: tuple[int, int, int], duration_ms: int, steps: int, stop: threading.Event):
+    """
+    Runs on a background thread so fade pacing is bounded by the OS timer,
+    not the event loop, and HTTP handlers stay responsive.
+    """
     duration_ms = clamp(duration_ms, 0, 60_000)
-    steps = clamp(steps, 1, 300)
-
-    async with _lock:
-        start = dict(_current)
-
-        for i in range(1, steps + 1):
-            t = i / steps
-            r = round(start["r"] + (target["r"] - start["r"]) * t)
-            g = round(start["g"] + (target["g"] - start["g"]) * t)
-            b = round(start["b"] + (target["b"] - start["b"]) * t)
-
-            ctl.set_color(r, g, b)
-            _current["r"], _current["g"], _current["b"] = r, g, b
-
-            await asyncio.sleep(duration_ms / steps / 1000.0)
-
-async def screen_sync_loop(cfg: SyncStartRequest):
-    ctl = get_controller()
-
+    # Steps shorter than FADE_MIN_STEP_MS would only add wakeups and back-to-back
+    # writes the eye can't see; coalesce them into fewer, longer steps
+    steps = clamp(steps, 1, max(1, min(300, duration_ms // FADE_MIN_STEP_MS)))
+
+    # Precompute the whole fade (integer interpolation) before the first write, so
+    # the paced loop only sleeps and writes. Steps that repeat the previous color
+    # (small deltas over many steps) are dropped: no USB write for those.
+    sr, sg, sb = _current
+    tr, tg, tb = target
+    dr, dg, db = tr - sr, tg - sg, tb - sb
+    schedule = []
+    last = (sr, sg, sb)
+    for i in range(1, steps + 1):
+        rgb = (sr + dr * i // steps, sg + dg * i // steps, sb + db * i // steps)
+        if rgb != last:
+            schedule.append((i - 1, rgb))
+            last = rgb
+
+    step_dt = duration_ms / steps / 1000.0
+    # Bound once: saves a global/attribute lookup per call in the step loop
+    show, monotonic, wait = show_color, time.monotonic, stop.wait
+    t0 = monotonic()
+
+    # Each color goes out at its step's start deadline (no drift); the sleep is
+    # skipped when behind and wakes immediately when cancel_fade() sets the event
+    for k, (r, g, b) in schedule:
+        delay = t0 + k * step_dt - monotonic()
+        if delay > 0 and wait(delay):
+            return
+        if not show(stop, r, g, b):
+            return
+    # Hold the last color for its step, so the fade spans duration_ms
+    delay = t0 + steps * step_dt - monotonic()
+    if delay > 0:
+        wait(delay)
+
+async def screen_sync_loop(cfg: SyncStartRequest, stop: threading.Event):
     fps = clamp(cfg.fps, 1, 120)
     thickness = clamp(cfg.thickness, 1, 400)
     down = clamp(cfg.downscale, 1, 16)
@@ -183,501 +419,209 @@ async def screen_sync_loop(cfg: SyncStartRequest):
     change_thr = clamp(cfg.change_threshold, 0, 255*3)
 
     dt = 1.0 / fps
+    beta = 1.0 - alpha
 
-    # State for smoothing + change threshold
-    smooth = np.array([0.0, 0.0, 0.0], dtype=np.float32)
-    last_rgb = (-1, -1, -1)
-
-    def avg_edge_color(img: np.ndarray, thickness_px: int):
-        h, w, _ = img.shape
-        t = max(1, min(thickness_px, w // 4, h // 4))
-
-        left = img[:, :t, :]
-        top = img[:t, :, :]
-        right = img[:, w - t :, :]
-
-        l = left.mean(axis=(0, 1))
-        tcol = top.mean(axis=(0, 1))
-        r = right.mean(axis=(0, 1))
-        return l, tcol, r
-
-    def combine_edges(l, tcol, r):
-        # Weighted towards top (movie-friendly)
-        return 0.25*l + 0.50*tcol + 0.25*r
-
-    # IMPORTANT: mss is best created once per task
-    with mss.mss() as sct:
-        if cfg.monitor < 1 or cfg.monitor >= len(sct.monitors):
-            raise ValueError(f"Invalid monitor index {cfg.monitor}. Available: 1..{len(sct.monitors)-1}")
-
-        mon = sct.monitors[cfg.monitor]
-
-        # Keep sync exclusive with other LED writers
-        async with _lock:
-            while not _sync_stop.is_set():
-                start = time.time()
-
-                frame = np.array(sct.grab(mon))[:, :, :3][:, :, ::-1]  # RGB
-                img = frame[::down, ::down, :]  # downscale for speed
+    # Only screen sync needs these; keep them off the server's import path
+    import numpy as np
+    from .screen_sync import avg_edge_color, combine_edges, _edge_rgb_smooth, warm_kernels
 
-                l, tcol, r = avg_edge_color(img, thickness_px=thickness)
-                target = combine_edges(l, tcol, r)
-
-                # smoothing
-                smooth = (1.0 - alpha) * smooth + alpha * target.astype(np.float32)
-                rgb = tuple(np.clip(smooth, 0, 255).astype(int))
-
-                # reduce USB spam
-                if sum(abs(a - b) for a, b in zip(rgb, last_rgb)) > change_thr:
-                    ctl.set_color(*rgb)
-                    _current["r"], _current["g"], _current["b"] = rgb
-                    last_rgb = rgb
-
-                elapsed = time.time() - start
-                sleep_for = dt - elapsed
-                if sleep_for > 0:
-                    await asyncio.sleep(sleep_for)
-                else:
-                    # if we’re slower than target FPS, yield control
-                    await asyncio.sleep(0)
-
-
-HTML_PAGE = r"""
-<!doctype html>
-<html lang="en">
-<head>
-  <meta charset="utf-8">
-  <meta name="viewport" content="width=device-width,initial-scale=1">
-  <title>Robobloq LED</title>
-  <style>
-    :root{
-      --bg:#0b0f17;
-      --card:rgba(255,255,255,.06);
-      --card2:rgba(255,255,255,.10);
-      --border:rgba(255,255,255,.12);
-      --text:rgba(255,255,255,.92);
-      --muted:rgba(255,255,255,.60);
-      --shadow:0 18px 60px rgba(0,0,0,.45);
-      --r:18px;
-      --accent:#6ae4ff;
-      --bad:#ff5b6e;
-    }
-    @media (prefers-color-scheme: light) {
-      :root{
-        --bg:#f6f7fb;
-        --card:rgba(0,0,0,.04);
-        --card2:rgba(0,0,0,.06);
-        --border:rgba(0,0,0,.10);
-        --text:rgba(0,0,0,.88);
-        --muted:rgba(0,0,0,.60);
-        --shadow:0 18px 60px rgba(0,0,0,.12);
-        --accent:#0ea5e9;
-        --bad:#e11d48;
-      }
-    }
-    *{box-sizing:border-box}
-    body{
-      margin:0;
-      font-family: system-ui, -apple-system, Segoe UI, Roboto, Arial;
-      color:var(--text);
-      background:
-        radial-gradient(1200px 600px at 20% 0%, rgba(106,228,255,0.20), transparent 60%),
-        radial-gradient(900px 500px at 80% 10%, rgba(255,204,102,0.16), transparent 62%),
-        radial-gradient(900px 700px at 55% 100%, rgba(72,227,155,0.14), transparent 60%),
-        var(--bg);
-    }
-    .wrap{max-width:760px;margin:26px auto;padding:0 16px 34px}
-    .top{display:flex;justify-content:space-between;align-items:center;gap:14px;margin-bottom:14px}
-    .brand{display:flex;gap:12px;align-items:center}
-    .logo{width:42px;height:42px;border-radius:14px;background:linear-gradient(135deg, rgba(106,228,255,.9), rgba(255,204,102,.8));box-shadow:0 12px 30px rgba(106,228,255,.25)}
-    h1{margin:0;font-size:18px}
-    .sub{margin:2px 0 0;font-size:13px;color:var(--muted)}
-    .pill{font-size:12px;color:var(--muted);border:1px solid var(--border);background:var(--card);padding:8px 10px;border-radius:999px;backdrop-filter:blur(10px)}
-    .card{border:1px solid var(--border);background:var(--card);border-radius:var(--r);padding:16px;box-shadow:var(--shadow);backdrop-filter:blur(12px)}
-    .tabs{display:flex;gap:8px;margin-bottom:12px}
-    .tab{padding:10px 12px;border-radius:12px;border:1px solid var(--border);background:var(--card2);cursor:pointer;user-select:none}
-    .tab.active{border-color:rgba(106,228,255,.35);background:linear-gradient(135deg, rgba(106,228,255,.18), rgba(106,228,255,.06))}
-    .row{display:flex;gap:10px;align-items:center;flex-wrap:wrap}
-    .btn{border:1px solid var(--border);background:var(--card2);color:var(--text);padding:10px 12px;border-radius:12px;cursor:pointer}
-    .btn.primary{border-color:rgba(106,228,255,.35);background:linear-gradient(135deg, rgba(106,228,255,.18), rgba(106,228,255,.06))}
-    .btn.danger{border-color:rgba(255,91,110,.35);background:linear-gradient(135deg, rgba(255,91,110,.16), rgba(255,91,110,.06))}
-    .picker{display:flex;align-items:center;gap:10px;padding:10px;border-radius:14px;border:1px solid var(--border);background:var(--card2)}
-    input[type=color]{width:54px;height:44px;border:none;background:none;padding:0;cursor:pointer}
-    .label{min-width:92px;font-size:13px;color:var(--muted)}
-    .value{min-width:70px;font-size:13px}
-    input[type=range]{width:280px;accent-color:var(--accent)}
-    .presets{display:flex;gap:8px;flex-wrap:wrap;margin-top:8px}
-    .preset{display:flex;align-items:center;gap:8px;padding:9px 10px;border-radius:999px;border:1px solid var(--border);background:var(--card2);cursor:pointer;font-size:13px}
-    .dot{width:12px;height:12px;border-radius:50%;border:1px solid rgba(255,255,255,.22);flex:none}
-    .toast{margin-top:12px;padding:10px 12px;border-radius:14px;border:1px solid var(--border);background:rgba(0,0,0,.18);color:var(--muted);min-height:44px;display:flex;align-items:center;justify-content:space-between;gap:10px;backdrop-filter:blur(10px)}
-    @media (prefers-color-scheme: light){ .toast{background:rgba(255,255,255,.55)} }
-    code{background:rgba(255,255,255,.10);padding:2px 6px;border-radius:8px}
-    @media (prefers-color-scheme: light){ code{background:rgba(0,0,0,.08)} }
-    .hint{margin-top:10px;font-size:12px;color:rgba(255,255,255,.45);line-height:1.35}
-    @media (prefers-color-scheme: light){ .hint{color:rgba(0,0,0,.45)} }
-    .hidden{display:none}
-  </style>
-</head>
-<body>
-  <div class="wrap">
-    <div class="top">
-      <div class="brand">
-        <div class="logo"></div>
-        <div>
-          <h1>Robobloq LED</h1>
-          <div class="sub">Linux web controller (1a86:fe07)</div>
-        </div>
-      </div>
-      <div class="pill" id="conn">Ready</div>
-    </div>
-
-    <div class="card">
-      <div class="tabs">
-        <div class="tab active" id="tab-colors" onclick="showTab('colors')">Colors</div>
-        <div class="tab" id="tab-effects" onclick="showTab('effects')">Effects</div>
-        <div class="tab" id="tab-sync" onclick="showTab('sync')">Sync</div>
-      </div>
-
-      <!-- Colors tab -->
-      <div id="panel-colors">
-        <div class="row">
-          <div class="picker">
-            <input id="picker" type="color" value="#ffc878" oninput="syncLabels()" />
-            <div>
-              <div class="label">Selected</div>
-              <div class="value" id="hexLabel">#FFC878</div>
-            </div>
-          </div>
-          <button class="btn primary" onclick="applyInstant()">Apply</button>
-          <button class="btn" onclick="applyFade()">Fade</button>
-          <button class="btn danger" onclick="turnOff()">Off</button>
-          <button class="btn" onclick="stopAll()">Stop</button>
-        </div>
-
-        <div style="height:12px"></div>
-
-        <div class="row">
-          <div class="label">Brightness</div>
-          <input id="bright" type="range" min="0" max="100" value="100" oninput="syncLabels()">
-          <div class="value" id="brightVal">100%</div>
-        </div>
-
-        <div style="height:12px"></div>
-
-        <div class="row">
-          <div class="label">Fade time</div>
-          <input id="duration" type="range" min="0" max="3000" value="800" oninput="syncLabels()">
-          <div class="value" id="durVal">800ms</div>
-        </div>
-
-        <div style="height:12px"></div>
-
-        <div class="presets">
-          <div class="preset" onclick="preset('#ffc878','Warm')"><span class="dot" style="background:#ffc878"></span>Warm</div>
-          <div class="preset" onclick="preset('#d8ecff','Cool')"><span class="dot" style="background:#d8ecff"></span>Cool</div>
-          <div class="preset" onclick="preset('#ffffff','White')"><span class="dot" style="background:#ffffff"></span>White</div>
-          <div class="preset" onclick="preset('#ff3b30','Red')"><span class="dot" style="background:#ff3b30"></span>Red</div>
-          <div class="preset" onclick="preset('#34c759','Green')"><span class="dot" style="background:#34c759"></span>Green</div>
-          <div class="preset" onclick="preset('#0a84ff','Blue')"><span class="dot" style="background:#0a84ff"></span>Blue</div>
-          <div class="preset" onclick="preset('#b400ff','Purple')"><span class="dot" style="background:#b400ff"></span>Purple</div>
-        </div>
-      </div>
-
-      <!-- Effects tab -->
-      <div id="panel-effects" class="hidden">
-        <div class="row">
-          <div class="label">Effect</div>
-          <div class="preset" onclick="selectEffect('pulse')" id="eff-pulse"><span class="dot" style="background:#ffc878"></span>Pulse</div>
-          <div class="preset" onclick="selectEffect('rainbow')" id="eff-rainbow"><span class="dot" style="background:#0a84ff"></span>Rainbow</div>
-        </div>
-
-        <div style="height:12px"></div>
-
-        <div class="row">
-          <div class="label">Speed</div>
-          <input id="speed" type="range" min="1" max="100" value="50" oninput="syncLabels()">
-          <div class="value" id="speedVal">50</div>
-        </div>
-
-        <div style="height:12px"></div>
-
-        <div class="row">
-          <button class="btn primary" onclick="startEffect()">Start</button>
-          <button class="btn" onclick="stopAll()">Stop</button>
-          <button class="btn danger" onclick="turnOff()">Off</button>
-          <div class="hint">Pulse uses the selected color (from Colors tab) + brightness.</div>
-        </div>
-      </div>
-
-      <!-- Sync tab -->
-      <div id="panel-sync" class="hidden">
-        <div class="row">
-          <div class="label">Monitor</div>
-          <input id="syncMonitor" type="number" min="1" value="2" style="width:90px">
-          <div class="label">FPS</div>
-          <input id="syncFps" type="range" min="5" max="90" value="60" oninput="syncLabels()">
-          <div class="value" id="syncFpsVal">60</div>
-        </div>
-
-        <div style="height:12px"></div>
-
-        <div class="row">
-          <div class="label">Thickness</div>
-          <input id="syncThickness" type="range" min="10" max="250" value="80" oninput="syncLabels()">
-          <div class="value" id="syncThicknessVal">80px</div>
-        </div>
-
-        <div style="height:12px"></div>
-
-        <div class="row">
-          <div class="label">Downscale</div>
-          <input id="syncDown" type="range" min="1" max="10" value="4" oninput="syncLabels()">
-          <div class="value" id="syncDownVal">4x</div>
-        </div>
-
-        <div style="height:12px"></div>
-
-        <div class="row">
-          <div class="label">Smoothing</div>
-          <input id="syncAlpha" type="range" min="0" max="100" value="35" oninput="syncLabels()">
-          <div class="value" id="syncAlphaVal">0.35</div>
-        </div>
-
-        <div style="height:12px"></div>
-
-        <div class="row">
-          <div class="label">Change threshold</div>
-          <input id="syncThr" type="range" min="0" max="60" value="6" oninput="syncLabels()">
-          <div class="value" id="syncThrVal">6</div>
-        </div>
-
-        <div style="height:12px"></div>
-
-        <div class="row">
-          <button class="btn primary" onclick="startSync()">Start Sync</button>
-          <button class="btn" onclick="stopSync()">Stop Sync</button>
-          <button class="btn" onclick="stopAll()">Stop All</button>
-          <button class="btn danger" onclick="turnOff()">Off</button>
-        </div>
-
-        <div class="hint">
-          Use <code>Monitor</code> = the MSS index that matches your external display (you found it was 2).<br>
-          Downscale 4x is a good default. Lower downscale = better quality but more CPU.
-        </div>
-      </div>
-
-      <div class="toast">
-        <div><strong>Status:</strong> <span id="status">Ready.</span></div>
-        <div><span id="mini">Brightness 100% • Fade 800ms • Speed 50</span></div>
-      </div>
-
-      <div class="hint">
-        Phone access: run with <code>--host 0.0.0.0</code> and open <code>http://&lt;PC_IP&gt;:8000</code>.<br>
-        Tip: Use <code>Stop</code> if an effect is running and you want manual control.
-      </div>
-    </div>
-  </div>
-  
-
-<script>
-let selectedEffect = "pulse";
-
-function setConn(text){ document.getElementById("conn").textContent = text; }
-function setStatus(text){ document.getElementById("status").textContent = text; }
-
-function showTab(name){
-  document.getElementById("panel-colors").classList.toggle("hidden", name !== "colors");
-  document.getElementById("panel-effects").classList.toggle("hidden", name !== "effects");
-  document.getElementById("panel-sync").classList.toggle("hidden", name !== "sync");
-
-  document.getElementById("tab-colors").classList.toggle("active", name === "colors");
-  document.getElementById("tab-effects").classList.toggle("active", name === "effects");
-  document.getElementById("tab-sync").classList.toggle("active", name === "sync");
-}
-
-function hexToRgb(hex) {
-  const v = hex.replace('#','');
-  return { r: parseInt(v.substring(0,2), 16), g: parseInt(v.substring(2,4), 16), b: parseInt(v.substring(4,6), 16) };
-}
-
-async function postJson(url, body) {
-  setConn("Working…");
-  const res = await fetch(url, { method:"POST", headers:{"Content-Type":"application/json"}, body: JSON.stringify(body) });
-  const data = await res.json().catch(() => ({}));
-  setConn(res.ok ? "Ready" : "Error");
-  return {ok: res.ok, data};
-}
-
-function syncLabels(){
-  const hex = document.getElementById("picker").value.toUpperCase();
-  const b = parseInt(document.getElementById("bright").value, 10);
-  const d = parseInt(document.getElementById("duration").value, 10);
-  const s = parseInt(document.getElementById("speed").value, 10);
-
-  document.getElementById("hexLabel").textContent = hex;
-  document.getElementById("brightVal").textContent = `${b}%`;
-  document.getElementById("durVal").textContent = `${d}ms`;
-  document.getElementById("speedVal").textContent = `${s}`;
-  document.getElementById("mini").textContent = `Brightness ${b}% • Fade ${d}ms • Speed ${s}`;
-  
-  const sfps = parseInt(document.getElementById("syncFps").value, 10);
-  const sth = parseInt(document.getElementById("syncThickness").value, 10);
-  const sdown = parseInt(document.getElementById("syncDown").value, 10);
-  const salpha = parseInt(document.getElementById("syncAlpha").value, 10);
-  const sthr = parseInt(document.getElementById("syncThr").value, 10);
-
-  document.getElementById("syncFpsVal").textContent = `${sfps}`;
-  document.getElementById("syncThicknessVal").textContent = `${sth}px`;
-  document.getElementById("syncDownVal").textContent = `${sdown}x`;
-  document.getElementById("syncAlphaVal").textContent = `${(salpha/100).toFixed(2)}`;
-  document.getElementById("syncThrVal").textContent = `${sthr}`;
-}
-
-async function applyInstant() {
-  const hex = document.getElementById("picker").value;
-  const b = parseInt(document.getElementById("bright").value, 10);
-  const rgb = hexToRgb(hex);
-
-  const {ok, data} = await postJson("/api/color", {...rgb, brightness: b});
-  setStatus(ok ? `Applied ${hex.toUpperCase()} @ ${b}%` : `Error: ${data.detail || "unknown"}`);
-}
-
-async function applyFade() {
-  const hex = document.getElementById("picker").value;
-  const b = parseInt(document.getElementById("bright").value, 10);
-  const d = parseInt(document.getElementById("duration").value, 10);
-  const rgb = hexToRgb(hex);
-
-  if (d === 0) return applyInstant();
-
-  const {ok, data} = await postJson("/api/fade", {...rgb, brightness: b, duration_ms: d, steps: 40});
-  setStatus(ok ? `Fading to ${hex.toUpperCase()} @ ${b}% (${d}ms)` : `Error: ${data.detail || "unknown"}`);
-}
-
-async function turnOff() {
-  const {ok, data} = await postJson("/api/off", {});
-  setStatus(ok ? "Turned off." : `Error: ${data.detail || "unknown"}`);
-}
-
-async function stopAll(){
-  // stops fade + stops effects
-  await postJson("/api/stop", {});
-  await postJson("/api/effect/stop", {});
-  setStatus("Stopped.");
-}
-
-async function startSync(){
-  const monitor = parseInt(document.getElementById("syncMonitor").value, 10);
-  const fps = parseInt(document.getElementById("syncFps").value, 10);
-  const thickness = parseInt(document.getElementById("syncThickness").value, 10);
-  const downscale = parseInt(document.getElementById("syncDown").value, 10);
-  const alpha = parseInt(document.getElementById("syncAlpha").value, 10) / 100.0;
-  const change_threshold = parseInt(document.getElementById("syncThr").value, 10);
-
-  const payload = { monitor, fps, thickness, downscale, alpha, change_threshold };
-
-  const {ok, data} = await postJson("/api/sync/start", payload);
-  setStatus(ok ? `Sync running (Monitor #${monitor} • ${fps} FPS)` : `Error: ${data.detail || "unknown"}`);
-}
-
-async function stopSync(){
-  const {ok, data} = await postJson("/api/sync/stop", {});
-  setStatus(ok ? "Sync stopped." : `Error: ${data.detail || "unknown"}`);
-}
-
-function preset(hex, name){
-  document.getElementById("picker").value = hex;
-  syncLabels();
-  const d = parseInt(document.getElementById("duration").value, 10);
-  setStatus(`Preset: ${name}`);
-  return (d === 0) ? applyInstant() : applyFade();
-}
-
-function selectEffect(name){
-  selectedEffect = name;
-  document.getElementById("eff-pulse").style.borderColor = (name === "pulse") ? "rgba(106,228,255,.35)" : "";
-  document.getElementById("eff-rainbow").style.borderColor = (name === "rainbow") ? "rgba(106,228,255,.35)" : "";
-  setStatus(`Effect selected: ${name}`);
-}
-
-async function startEffect(){
-  const s = parseInt(document.getElementById("speed").value, 10);
-  const b = parseInt(document.getElementById("bright").value, 10);
-  const hex = document.getElementById("picker").value;
-  const rgb = hexToRgb(hex);
-
-  let payload = { effect: selectedEffect, speed: s };
-
-  // Pulse uses chosen color + brightness
-  if (selectedEffect === "pulse"){
-    payload = { ...payload, ...rgb, brightness: b };
-  }
-
-  const {ok, data} = await postJson("/api/effect/start", payload);
-  setStatus(ok ? `Effect running: ${selectedEffect} (speed ${s})` : `Error: ${data.detail || "unknown"}`);
+    # State for smoothing + change threshold (last written color as plain int locals);
+    # the NumPy fallback smooths in place through preallocated float32 buffers
+    smooth = np.array([0.0, 0.0, 0.0], dtype=np.float32)
+    target = np.empty(3, dtype=np.float32)
+    lr = lg = lb = -1
+
+    # Thickness is in downscaled pixels, so the strips cover thickness*down screen pixels
+    edge_px = thickness * down
+
+    def sample() -> tuple[int, int, int]:
+        """Grab + reduce + smooth one frame; runs on _capture_thread."""
+        # Grab only the three edge strips (BGRA views), not the whole monitor.
+        # Subsampling stays a strided view on purpose: a reshape-and-mean
+        # block downscale reads every pixel and measured ~20x slower here.
+        left, top, right = (s[::down, ::down] for s in grab_edges(edge_px))
+
+        if _edge_rgb_smooth is not None:
+            # Reduce + combine + smooth + clip in one compiled call
+            return _edge_rgb_smooth(left, top, right, smooth, alpha)
+        lcol, tcol, rcol = avg_edge_color(left, top, right)
+        B, G, R = combine_edges(lcol, tcol, rcol)
+
+        # smoothing: smooth = beta*smooth + alpha*target, without temporaries
+        target[:] = (R, G, B)
+        np.multiply(target, alpha, out=target)
+        np.multiply(smooth, beta, out=smooth)
+        np.add(smooth, target, out=smooth)
+        # A convex mix of 0..255 values: never negative, min() absorbs float32 rounding
+        r, g, b = smooth.tolist()
+        return min(int(r), 255), min(int(g), 255), min(int(b), 255)
+
+    # Keep sync exclusive with other LED writers; holding _lock also means the
+    # previous run is done with the shared capture before it may be replaced
+    async with _lock:
+        run_on_capture = functools.partial(asyncio.get_running_loop().run_in_executor, _capture_thread)
+        grab_edges = (await run_on_capture(get_capture, cfg.monitor)).grab_edges
+        # Compile (or load from numba's disk cache) before pacing starts, so the first
+        # frame isn't late; a no-op once compiled. Not done at server startup: that
+        # would import numba/cv2 even when sync is never used.
+        await run_on_capture(warm_kernels)
+        next_deadline = time.monotonic()
+        while True:
+
+            # Grab/reduce off the event loop; color_writer's USB write overlaps with it
+            r, g, b = await run_on_capture(sample)
+            if stop.is_set():
+                return
+
+            # reduce USB spam (scalar int math, no generator/zip per frame)
+            if abs(r - lr) + abs(g - lg) + abs(b - lb) > change_thr:
+                post_color(stop, r, g, b)
+                lr, lg, lb = r, g, b
+
+            # Pace against fixed deadlines (no drift), like run_sync
+            next_deadline = await _pace(next_deadline + dt, dt)
+
+# The page is static: read, compress and hash it once instead of per request.
+# It ships as package data, so it's never compiled into this module's .pyc.
+_HTML_BYTES = importlib.resources.files(__package__).joinpath("index.html").read_bytes()
+if not os.environ.get("ROBOBLOQ_LED_DEV"):
+    # Cheap safe minify: drop indentation and blank lines. Newlines stay, since the
+    # inline script has // comments and relies on them ending at the line break.
+    _HTML_BYTES = b"\n".join(line.strip() for line in _HTML_BYTES.splitlines() if line.strip()) + b"\n"
+_HTML_BYTES_GZ = gzip.compress(_HTML_BYTES, 9)
+_HTML_BYTES_BR = (
+    brotli.compress(_HTML_BYTES, mode=brotli.MODE_TEXT, quality=11) if brotli else None
+)
+_HTML_ETAG = f'W/"{hashlib.blake2s(_HTML_BYTES).hexdigest()}"'
+_HTML_HEADERS = {
+    "Cache-Control": "public, max-age=3600",
+    "ETag": _HTML_ETAG,
+    "Vary": "Accept-Encoding",
 }
+_HTML_HEADERS_BR = {**_HTML_HEADERS, "Content-Encoding": "br"}
+_HTML_HEADERS_GZ = {**_HTML_HEADERS, "Content-Encoding": "gzip"}
 
-syncLabels();
-selectEffect("pulse");
-</script>
-</body>
-</html>
-"""
-
+@functools.lru_cache(maxsize=64)
+def _accepted_encodings(header: str) -> frozenset[str]:
+    """
+    Content codings an Accept-Encoding header allows, honouring q=0 (refused).
+    A browser sends the same header on every request, so parses are cached.
+    """
+    accepted, refused = set(), set()
+    for item in header.lower().split(","):
+        name, *params = (p.strip() for p in item.split(";"))
+        q = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if name:
+            (accepted if q > 0 else refused).add(name)
+    if "*" in accepted:
+        accepted |= {"br", "gzip"} - refused
+    return frozenset(accepted - refused)
+
+# async: nothing here blocks, so skip the threadpool hop a plain def would take
 @app.get("/", response_class=HTMLResponse)
-def index():
-    return HTML_PAGE
+async def index(request: Request):
+    if _HTML_ETAG in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=_HTML_HEADERS)
+    accept = _accepted_encodings(request.headers.get("accept-encoding", ""))
+    if _HTML_BYTES_BR is not None and "br" in accept:
+        return Response(
+            _HTML_BYTES_BR,
+            media_type="text/html",
+            headers=_HTML_HEADERS_BR,
+        )
+    if "gzip" in accept:
+        return Response(
+            _HTML_BYTES_GZ,
+            media_type="text/html",
+            headers=_HTML_HEADERS_GZ,
+        )
+    return Response(_HTML_BYTES, media_type="text/html", headers=_HTML_HEADERS)
+
+@app.post("/api/color", openapi_extra=_body_schema(Color))
+async def set_color_api(request: Request):
+    data = await _json_body(request)
+    r, g, b = _int_field(data, "r"), _int_field(data, "g"), _int_field(data, "b")
+    brightness = clamp(_int_field(data, "brightness", 100) or 100, 0, 100)
 
-@app.post("/api/color")
-def set_color_api(c: Color):
-    ctl = get_controller()
     cancel_fade()
     cancel_sync()
     cancel_effect()
+    cancel_color()
 
-    brightness = clamp(c.brightness or 100, 0, 100)
-    r, g, b = apply_brightness(clamp(c.r,0,255), clamp(c.g,0,255), clamp(c.b,0,255), brightness)
+    r, g, b = apply_brightness(r, g, b, brightness)
 
-    ctl.set_color(r, g, b)
-    _current["r"], _current["g"], _current["b"] = r, g, b
+    # Hand off to color_writer; a newer request overwrites this one if it's still
+    # pending. Wait for the write that carries it, so a device error isn't reported as ok.
+    done = asyncio.get_running_loop().create_future()
+    _color_waiters.append(done)
+    post_color(_color_stop, r, g, b)
+    try:
+        await done
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"LED write failed: {e}")
     return JSONResponse({"ok": True, "r": r, "g": g, "b": b, "brightness": brightness})
 
-@app.post("/api/fade")
-async def fade_api(req: FadeRequest):
+@app.post("/api/fade", openapi_extra=_body_schema(FadeRequest))
+async def fade_api(request: Request):
+    data = await _json_body(request)
+    r, g, b = _int_field(data, "r"), _int_field(data, "g"), _int_field(data, "b")
+    brightness = clamp(_int_field(data, "brightness", 100) or 100, 0, 100)
+    duration_ms = clamp(_int_field(data, "duration_ms", 800), 0, 60_000)
+    req_steps = _int_field(data, "steps", 40)
+
     cancel_fade()
     cancel_sync()
     cancel_effect()
+    cancel_color()
 
-    brightness = clamp(req.brightness or 100, 0, 100)
-    r, g, b = apply_brightness(clamp(req.r,0,255), clamp(req.g,0,255), clamp(req.b,0,255), brightness)
-    target = {"r": r, "g": g, "b": b}
+    r, g, b = apply_brightness(r, g, b, brightness)
 
-    global _fade_task
-    _fade_task = asyncio.create_task(fade_to(target, req.duration_ms, req.steps))
-    return JSONResponse({"ok": True, "target": target, "brightness": brightness, "duration_ms": req.duration_ms})
+    # No more steps than distinct values on the widest channel; duration_ms is
+    # kept, so fewer steps just means a longer sleep per step
+    sr, sg, sb = _current
+    max_delta = max(abs(r - sr), abs(g - sg), abs(b - sb))
+    steps = max(1, min(req_steps, max_delta))
+
+    global _fade_thread, _fade_stop
+    _fade_stop = threading.Event()
+    _fade_thread = threading.Thread(
+        target=_fade_worker, args=((r, g, b), duration_ms, steps, _fade_stop), daemon=True
+    )
+    _fade_thread.start()
+    return JSONResponse({"ok": True, "target": {"r": r, "g": g, "b": b}, "brightness": brightness, "duration_ms": duration_ms})
 
 @app.post("/api/effect/start")
 async def effect_start(req: EffectRequest):
     cancel_fade()
     cancel_sync()
     cancel_effect()
+    cancel_color()
 
     eff = (req.effect or "").lower().strip()
     speed = clamp(req.speed, 1, 100)
 
-    global _effect_task
+    global _effect_task, _effect_stop
     if eff == "pulse":
         # Use chosen color (with brightness)
         if req.r is None or req.g is None or req.b is None:
             raise HTTPException(status_code=400, detail="pulse requires r,g,b")
         brightness = clamp(req.brightness or 100, 0, 100)
-        r, g, b = apply_brightness(clamp(req.r,0,255), clamp(req.g,0,255), clamp(req.b,0,255), brightness)
+        r, g, b = apply_brightness(req.r, req.g, req.b, brightness)
         base = {"r": r, "g": g, "b": b}
-        _effect_task = asyncio.create_task(effect_pulse(base, speed))
+        _effect_stop = threading.Event()
+        _effect_task = asyncio.create_task(effect_pulse(base, speed, _effect_stop))
         return JSONResponse({"ok": True, "effect": "pulse", "base": base, "speed": speed})
 
     elif eff == "rainbow":
-        _effect_task = asyncio.create_task(effect_rainbow(speed))
+        _effect_stop = threading.Event()
+        _effect_task = asyncio.create_task(effect_rainbow(speed, _effect_stop))
         return JSONResponse({"ok": True, "effect": "rainbow", "speed": speed})
 
     raise HTTPException(status_code=400, detail="Unknown effect. Use 'pulse' or 'rainbow'.")
@@ -688,10 +632,12 @@ async def sync_start(req: SyncStartRequest):
     cancel_fade()
     cancel_effect()
     cancel_sync()
+    cancel_color()
 
-    global _sync_task
+    global _sync_task, _sync_stop
     try:
-        _sync_task = asyncio.create_task(screen_sync_loop(req))
+        _sync_stop = threading.Event()
+        _sync_task = asyncio.create_task(screen_sync_loop(req, _sync_stop))
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -702,9 +648,9 @@ async def sync_start(req: SyncStartRequest):
     })
 
 @app.post("/api/sync/stop")
-def sync_stop():
+async def sync_stop():
     cancel_sync()
-    return JSONResponse({"ok": True, "mode": "manual"})
+    return Response(_SYNC_STOPPED_BODY, media_type="application/json")
 
 @app.get("/api/status")
 def status():
@@ -713,29 +659,42 @@ def status():
         mode = "sync"
     elif _effect_task and not _effect_task.done():
         mode = "effect"
-    elif _fade_task and not _fade_task.done():
+    elif _fade_thread and _fade_thread.is_alive():
         mode = "fade"
-    return JSONResponse({"ok": True, "mode": mode, "current": _current})
+    r, g, b = _current
+    return JSONResponse({"ok": True, "mode": mode, "current": {"r": r, "g": g, "b": b}})
 
 @app.post("/api/effect/stop")
-def effect_stop():
+async def effect_stop():
     cancel_sync()
     cancel_effect()
-    return JSONResponse({"ok": True})
-
+    return Response(_OK_BODY, media_type="application/json")
+
+def _write_off():
+    # Always written (no same-color skip): "off" must hold even if the LED was
+    # changed outside this process
+    global _current_written_at
+    with _state_lock:
+        _current_written_at = None
+        get_controller().set_color(0, 0, 0)
+        _current[:] = b"\x00\x00\x00"
+        _current_written_at = time.monotonic()
+
+# async so the cancels run on the loop (they swap the color_writer mailbox);
+# only the locked HID write goes to a worker thread
 @app.post("/api/off")
-def off_api():
-    ctl = get_controller()
+async def off_api():
     cancel_fade()
     cancel_sync()
     cancel_effect()
-    ctl.set_color(0, 0, 0)
-    _current["r"], _current["g"], _current["b"] = 0, 0, 0
-    return JSONResponse({"ok": True})
+    cancel_color()
+    await asyncio.to_thread(_write_off)
+    return Response(_OK_BODY, media_type="application/json")
 
 @app.post("/api/stop")
-def stop_api():
+async def stop_api():
     cancel_fade()
     cancel_sync()
     cancel_effect()
-    return JSONResponse({"ok": True})
\ No newline at end of file
+    cancel_color()
+    return Response(_OK_BODY, media_type="application/json")
\ No newline at end of file